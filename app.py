@@ -1,20 +1,36 @@
 import os
-import json
-import time
-import boto3
+import secrets
+import asyncio
+import gzip
+import threading
+import httpx
+import orjson
 import requests
-from uuid import uuid4
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import streamlit as st
-from dotenv import load_dotenv
-from botocore.exceptions import NoCredentialsError, ClientError, EndpointConnectionError
-from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-load_dotenv()
+# boto3/botocore e dotenv são importados sob demanda (custo alto de import no cold start)
+
+@st.cache_resource(show_spinner=False)
+def _env() -> bool:
+    """
+    Carrega o .env uma única vez por processo.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    return True
+
+_env()
 
 # ----------------- Config -----------------
 POD_ID = os.getenv("POD_ID", "i1q8dnudt5raii")
 BACKEND_PORT = "8000"
 BACKEND_URL = f"https://{POD_ID}-{BACKEND_PORT}.proxy.runpod.net/"
+# Gzip no corpo do /chat só se o backend descomprimir requisições (o Flask não faz por padrão)
+CHAT_GZIP = os.getenv("CHAT_GZIP", "false").lower() in ("1", "true", "yes")
+GZIP_MIN_BYTES = 4096  # abaixo disso o gzip não compensa no corpo do /chat
 
 BUCKET_NAME = os.getenv("BUCKET_NAME", "rag-teste-bnu")
 S3_ENDPOINT = os.getenv("S3_ENDPOINT")  # deixe vazio/nulo para AWS S3 oficial
@@ -24,15 +40,41 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_SESSION_TOKEN = os.getenv("AWS_SESSION_TOKEN")  # opcional (credenciais temporárias)
 PREFIX_BASE = "uploads"
 
+# Multipart em partes de 8 MB, com várias partes em paralelo por arquivo
+PART_SIZE = 8 * 1024 * 1024
+PART_CONCURRENCY = 10
+MAX_UPLOAD_WORKERS = 4
+# Cada arquivo em envio abre até PART_CONCURRENCY requisições; o pool do client cobre todas
+S3_MAX_POOL_CONNECTIONS = MAX_UPLOAD_WORKERS * PART_CONCURRENCY
+PROGRESS_INTERVAL = 0.1  # segundos entre atualizações da barra de progresso
+# Acima disso o multipart é feito à mão, lendo uma parte por vez do arquivo
+LARGE_FILE_THRESHOLD = 100 * 1024 * 1024
+
 def s3_safe_key(name: str) -> str:
-    ext = ""
-    if "." in name:
-        ext = "." + name.split(".")[-1]
-    return f"{uuid4().hex}{ext}"
+    return f"{secrets.token_hex(16)}{os.path.splitext(name)[1].lower()}"
 
+@st.cache_resource(show_spinner=False)
+def get_http_session() -> requests.Session:
+    """
+    Sessão HTTP única para o backend (reaproveita conexões keep-alive/TLS entre reruns).
+    """
+    session = requests.Session()
+    session.mount(
+        "https://",
+        HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+        ),
+    )
+    return session
+
+SESSION = get_http_session()
+
+@st.cache_data(ttl=30, show_spinner=False)
 def check_health_server() -> bool:
     try:
-        resp = requests.get(f"{BACKEND_URL}/health", timeout=10)
+        resp = SESSION.get(f"{BACKEND_URL}/health", timeout=10)
         return resp.status_code == 200
     except requests.RequestException:
         return False
@@ -46,19 +88,106 @@ session_kwargs = dict(
 if AWS_SESSION_TOKEN:
     session_kwargs["aws_session_token"] = AWS_SESSION_TOKEN
 
-s3 = boto3.client(
-    "s3",
-    endpoint_url=S3_ENDPOINT or None,
-    config=Config(signature_version="s3v4", retries={"max_attempts": 3, "mode": "standard"}),
-    **session_kwargs
-)
+@st.cache_resource(show_spinner=False)
+def get_s3_client():
+    """
+    Cliente S3 único por processo (evita recriar o client boto3 a cada rerun).
+    """
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        "s3",
+        endpoint_url=S3_ENDPOINT or None,
+        config=Config(
+            signature_version="s3v4",
+            retries={"max_attempts": 3, "mode": "adaptive"},
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            tcp_keepalive=True,
+        ),
+        **session_kwargs
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_s3_preflight_client():
+    """
+    Cliente S3 só para o teste de acesso: timeouts curtos e uma única tentativa
+    (total_max_attempts conta a requisição inicial), para que um S3 fora do ar
+    não segure a página.
+    """
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        "s3",
+        endpoint_url=S3_ENDPOINT or None,
+        config=Config(
+            signature_version="s3v4",
+            connect_timeout=3,
+            read_timeout=5,
+            retries={"total_max_attempts": 1},
+        ),
+        **session_kwargs
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_transfer_config():
+    """
+    Multipart em partes de PART_SIZE, com várias partes em paralelo por arquivo.
+    """
+    from boto3.s3.transfer import TransferConfig
 
+    return TransferConfig(
+        multipart_threshold=PART_SIZE,
+        multipart_chunksize=PART_SIZE,
+        max_concurrency=PART_CONCURRENCY,
+        io_chunksize=1024 * 1024,
+        use_threads=True,
+    )
+
+def upload_multipart(client, f, bucket: str, key: str, size: int, extra_args: dict, callback=None) -> None:
+    """
+    Upload multipart manual: cada parte é lida com seek/read e enviada em paralelo,
+    sem o buffer intermediário do TransferManager. `callback` recebe os bytes de cada parte enviada.
+    """
+    mpu = client.create_multipart_upload(Bucket=bucket, Key=key, **extra_args)
+    upload_id = mpu["UploadId"]
+    lock = threading.Lock()
+
+    def _part(number: int, offset: int) -> dict:
+        with lock:
+            f.seek(offset)
+            body = f.read(PART_SIZE)
+        resp = client.upload_part(
+            Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body
+        )
+        if callback:
+            callback(len(body))
+        return {"PartNumber": number, "ETag": resp["ETag"]}
+
+    try:
+        offsets = range(0, size, PART_SIZE)
+        with ThreadPoolExecutor(max_workers=PART_CONCURRENCY) as ex:
+            parts = list(ex.map(_part, range(1, len(offsets) + 1), offsets))
+        client.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+    except Exception:
+        try:
+            client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        except Exception:
+            pass  # o erro original é o que interessa ao usuário
+        raise
+
+@st.cache_data(ttl=300, show_spinner=False)
 def check_s3_access() -> tuple[bool, str]:
     """
     Verifica se o bucket é acessível e credenciais estão ok.
     """
+    from botocore.exceptions import NoCredentialsError, ClientError, EndpointConnectionError
+
     try:
-        s3.head_bucket(Bucket=BUCKET_NAME)
+        get_s3_preflight_client().head_bucket(Bucket=BUCKET_NAME)
         return True, "Acesso ao bucket OK."
     except NoCredentialsError:
         return False, "Credenciais AWS ausentes."
@@ -70,125 +199,103 @@ def check_s3_access() -> tuple[bool, str]:
     except Exception as e:
         return False, f"Erro inesperado no S3: {e}"
 
-def perguntar_backend(pergunta: str, k: int = 4, namespace: str | None = None, documentos: list | None = None) -> dict:
+@st.cache_resource(show_spinner=False)
+def get_async_backend() -> tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]:
+    """
+    Event loop em thread própria (vive o processo todo) e um AsyncClient ligado a ele,
+    para que as conexões keep-alive com o backend sejam reaproveitadas entre reruns.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="backend-loop", daemon=True).start()
+
+    async def _client() -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=BACKEND_URL,
+            timeout=300,
+            limits=httpx.Limits(max_keepalive_connections=8),
+        )
+
+    return loop, asyncio.run_coroutine_threadsafe(_client(), loop).result()
+
+BACKEND_LOOP, ASYNC_CLIENT = get_async_backend()
+
+async def _post_chat(client: httpx.AsyncClient, payload: dict) -> dict:
+    try:
+        body = orjson.dumps(payload)
+        headers = {"Content-Type": "application/json"}
+        if CHAT_GZIP and len(body) >= GZIP_MIN_BYTES:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        resp = await client.post("/chat", content=body, headers=headers)
+        resp.raise_for_status()
+        try:
+            data = orjson.loads(resp.content)
+        except orjson.JSONDecodeError:
+            data = {"raw": resp.text}
+        return {"ok": True, "data": data}
+    except httpx.HTTPStatusError as e:
+        return {"ok": False, "error": f"HTTP {e.response.status_code}: {e.response.text}"}
+    except httpx.HTTPError as e:
+        return {"ok": False, "error": f"Falha de conexão com o backend: {e}"}
+
+async def perguntar_backend(pergunta: str, k: int = 4, namespace: str | None = None, documentos: list | None = None) -> dict:
     """
     Envia a pergunta ao backend Flask (rota /chat) e retorna o JSON de resposta.
     A rota /chat aceita: {"question": "...", "k": int, "namespace": str?, "documents": list?}
     """
-    if not pergunta or not pergunta.strip():
+    q = pergunta.strip() if pergunta else ""
+    if not q:
         return {"ok": False, "error": "Pergunta vazia."}
 
-    payload = {"question": pergunta.strip(), "k": k}
+    payload = {"question": q, "k": k}
     if namespace:
         payload["namespace"] = namespace
     if documentos:
         payload["documents"] = documentos
 
-    try:
-        resp = requests.post(f"{BACKEND_URL}/chat", json=payload, timeout=300)
-        resp.raise_for_status()
-        try:
-            data = resp.json()
-        except ValueError:
-            data = {"raw": resp.text}
-        return {"ok": True, "data": data}
-    except requests.HTTPError as e:
-        msg = e.response.text if e.response is not None else str(e)
-        return {"ok": False, "error": f"HTTP {getattr(e.response, 'status_code', '?')}: {msg}"}
-    except requests.RequestException as e:
-        return {"ok": False, "error": f"Falha de conexão com o backend: {e}"}
+    return await _post_chat(ASYNC_CLIENT, payload)
 
 # ----------------- UI -----------------
+FOOTER_HTML = """
+<style>
+.fixed-footer {
+    position: fixed;
+    left: 0;
+    bottom: 0;
+    width: 100%;
+    background-color: #f1f1f1;
+    color: #333;
+    text-align: center;
+    padding: 10px;
+    box-shadow: 0 -2px 5px rgba(0,0,0,0.1);
+}
+</style>
+<div class="fixed-footer">
+    Mensagem de rodapé
+</div>
+"""
+
 st.set_page_config(page_title="Unimed chat AI", page_icon="💬", layout="centered")
 st.title("Assistente de Chat")
 
-footer_placeholder = st.empty()
-
 with st.sidebar:
     with st.expander("Server"):
-        if st.button("Verificar Servidor de IA", use_container_width=True):
+        verificar = st.button("Verificar Servidor de IA", use_container_width=True)
+        forcar = st.button("Forçar nova verificação", use_container_width=True)
+        if verificar or forcar:
+            if forcar:
+                check_health_server.clear()
             ok = check_health_server()
-            placeholder = st.empty()
             if ok:
-                placeholder.success("Servidor OK ✅")
+                st.toast("Servidor OK", icon="✅")
             else:
-                placeholder.error("Servidor Indisponível ❌")
-            time.sleep(5)
-            placeholder.empty()
+                st.toast("Servidor Indisponível", icon="❌")
 
     with st.expander("Inserir novos arquivos", expanded=True):
         uploaded_files = st.file_uploader("Adicionar arquivo(s):", type=['pdf'], accept_multiple_files=True)
 
-        # Teste rápido do S3 (opcional, mas ajuda MUITO a diagnosticar)
-        if st.button("Testar acesso ao S3", use_container_width=True):
-            ok, msg = check_s3_access()
-            if ok:
-                st.success(msg) 
-            else: 
-                st.error(msg)
-
-        col1, col2 = st.columns([2,2])
-        with col1:
-            if st.button("Enviar para S3", use_container_width=True):
-                if not uploaded_files:
-                    st.warning("Nenhum arquivo selecionado.")
-                else:
-                    enviados: list[str] = []
-                    falhas: list[tuple[str, str]] = []
-
-                    for f in uploaded_files:
-                        progress = st.progress(0)
-                        status = st.empty()
-
-                        key = f"{PREFIX_BASE}/{s3_safe_key(f.name)}"
-                        try:
-                            f.seek(0)  # garante ponteiro no início
-                            s3.upload_fileobj(
-                                f,
-                                BUCKET_NAME,
-                                key,
-                                ExtraArgs={"ContentType": "application/pdf"},
-                            )
-                            progress.progress(100)
-                            status.text("Concluído ✅")
-                            st.success(f"✅ Enviado: s3://{BUCKET_NAME}/{key}")
-                            enviados.append(key)
-
-                        except NoCredentialsError:
-                            progress.empty()
-                            status.empty()
-                            falhas.append((f.name, "NoCredentialsError (credenciais ausentes)"))
-                            st.error("⚠️ Credenciais da AWS não disponíveis.")
-                        except EndpointConnectionError as error:
-                            progress.empty()
-                            status.empty()
-                            falhas.append((f.name, f"EndpointConnectionError: {error}"))
-                            st.error(f"🌐 Falha de conexão com o endpoint S3: {error}")
-                        except ClientError as error:
-                            progress.empty()
-                            status.empty()
-                            err = error.response.get("Error", {})
-                            falhas.append((f.name, f"{err.get('Code')} - {err.get('Message')}"))
-                            st.error(f"❌ Erro do cliente S3 ao enviar {f.name}: {err}")
-                        except Exception as error:
-                            progress.empty()
-                            status.empty()
-                            falhas.append((f.name, str(error)))
-                            st.error(f"❌ Erro ao enviar {f.name}: {error}")
-
-                    # Resumo
-                    if enviados:
-                        st.info("Arquivos enviados com sucesso:")
-                        for k_ in enviados:
-                            st.write(f"- s3://{BUCKET_NAME}/{k_}")
-                    if falhas:
-                        st.warning("Falhas:")
-                        for nome, motivo in falhas:
-                            st.write(f"- {nome}: {motivo}")
-
-        with col2:
-            if st.button("Atualizar base de conhecimento", use_container_width=True):
-                pass
+        # Preenchido no fim do script, depois do chat (o teste de acesso ao S3 pode demorar)
+        s3_area = st.container()
 
     with st.expander("Opções avançadas", expanded=False):
         k = st.slider("k (nº de documentos)", min_value=1, max_value=10, value=4, step=1)
@@ -202,16 +309,16 @@ if st.button("Enviar"):
 
     if docs_json.strip():
         try:
-            documentos = json.loads(docs_json)
+            documentos = orjson.loads(docs_json)
         except Exception as error:
             st.warning(f"Documentos inválidos: {error}")
 
     with st.spinner("Consultando os documentos..."):
-        resposta = perguntar_backend(
+        resposta = asyncio.run_coroutine_threadsafe(perguntar_backend(
             pergunta=pergunta,
             k=k,
             namespace=namespace or None, documentos=documentos
-            )
+            ), BACKEND_LOOP).result()
     
     if resposta["ok"]:
         data = resposta["data"]
@@ -233,23 +340,128 @@ if st.button("Enviar"):
         st.error(resposta["error"])
 
 
+# ----------------- S3 (sidebar) -----------------
+with s3_area:
+    # Acesso ao S3 verificado de antemão (em cache); o botão refaz o teste na hora
+    testar_s3 = st.button("Testar acesso ao S3", use_container_width=True)
+    if testar_s3:
+        check_s3_access.clear()
+    access_ok, access_msg = check_s3_access()
+    if not access_ok:
+        st.error(access_msg)
+    elif testar_s3:
+        st.success(access_msg)
+
+    col1, col2 = st.columns([2,2])
+    with col1:
+        if st.button("Enviar para S3", use_container_width=True, disabled=not access_ok):
+            if not uploaded_files:
+                st.warning("Nenhum arquivo selecionado.")
+            else:
+                enviados: list[str] = []
+                falhas: list[tuple[str, str]] = []
+
+                from botocore.exceptions import ClientError, EndpointConnectionError
+
+                # Locais em vez de globais no laço de envio
+                s3 = get_s3_client()
+                upload = s3.upload_fileobj
+                transfer_config = get_transfer_config()
+                bucket = BUCKET_NAME
+                key_prefix = f"{PREFIX_BASE}/"
+
+                # Bytes enviados, somados pelas threads de transferência
+                enviados_bytes = [0]
+                bytes_lock = threading.Lock()
+
+                def _on_bytes(n: int) -> None:
+                    with bytes_lock:
+                        enviados_bytes[0] += n
+
+                def _upload(f) -> tuple[str, str, str | None]:
+                    """
+                    Envia um arquivo ao S3 (roda em thread; não chama st.*).
+                    Retorna (nome, key, erro) com erro None em caso de sucesso.
+                    """
+                    name = f.name
+                    size = f.size
+                    key = key_prefix + s3_safe_key(name)
+                    extra_args = {"ContentType": "application/pdf"}
+                    try:
+                        # O ponteiro já volta ao início após a checagem do cabeçalho
+                        if size > LARGE_FILE_THRESHOLD:
+                            upload_multipart(s3, f, bucket, key, size, extra_args, callback=_on_bytes)
+                        else:
+                            upload(
+                                f,
+                                bucket,
+                                key,
+                                ExtraArgs=extra_args,
+                                Config=transfer_config,
+                                Callback=_on_bytes,
+                            )
+                        return name, key, None
+                    except EndpointConnectionError as error:
+                        return name, key, f"EndpointConnectionError: {error}"
+                    except ClientError as error:
+                        err = error.response.get("Error", {})
+                        return name, key, f"{err.get('Code')} - {err.get('Message')}"
+                    except Exception as error:
+                        return name, key, str(error)
+
+                # O filtro type=['pdf'] é só no navegador: confere o cabeçalho antes de enviar
+                validos = []
+                for f in uploaded_files:
+                    head = f.read(5)
+                    f.seek(0)
+                    if head != b"%PDF-":
+                        falhas.append((f.name, "não é um PDF"))
+                        st.error(f"❌ {f.name} não é um PDF válido.")
+                        continue
+                    validos.append(f)
+
+                if validos:
+                    progress = st.progress(0)
+                    status = st.empty()
+                    total = len(validos)
+                    total_bytes = max(sum(f.size for f in validos), 1)
+                    processados = 0
+
+                    # Uploads em paralelo; a UI é atualizada só pela thread principal,
+                    # no máximo a cada PROGRESS_INTERVAL segundos
+                    with ThreadPoolExecutor(max_workers=min(MAX_UPLOAD_WORKERS, total)) as ex:
+                        pendentes = {ex.submit(_upload, f) for f in validos}
+                        while pendentes:
+                            prontos, pendentes = wait(
+                                pendentes, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED
+                            )
+                            for future in prontos:
+                                nome, key, erro = future.result()
+                                processados += 1
+                                if erro is None:
+                                    st.success(f"✅ Enviado: s3://{bucket}/{key}")
+                                    enviados.append(key)
+                                else:
+                                    falhas.append((nome, erro))
+                                    st.error(f"❌ Erro ao enviar {nome}: {erro}")
+                            with bytes_lock:
+                                fracao = enviados_bytes[0] / total_bytes
+                            progress.progress(min(max(fracao, 0.0), 1.0))
+                            if prontos:
+                                status.text(f"{processados}/{total} arquivo(s) processado(s)")
+
+                    progress.progress(1.0)
+                    status.text("Concluído ✅")
+
+                # Resumo
+                if enviados:
+                    st.info("Arquivos enviados com sucesso:\n\n" + "\n".join(f"- s3://{bucket}/{k_}" for k_ in enviados))
+                if falhas:
+                    st.warning("Falhas:\n\n" + "\n".join(f"- {nome}: {motivo}" for nome, motivo in falhas))
+
+    with col2:
+        if st.button("Atualizar base de conhecimento", use_container_width=True):
+            pass
+
 # -------------------------------------------------
-with footer_placeholder.container():
-    st.markdown("""
-    <style>
-    .fixed-footer {
-        position: fixed;
-        left: 0;
-        bottom: 0;
-        width: 100%;
-        background-color: #f1f1f1;
-        color: #333;
-        text-align: center;
-        padding: 10px;
-        box-shadow: 0 -2px 5px rgba(0,0,0,0.1);
-    }
-    </style>
-    <div class="fixed-footer">
-        Mensagem de rodapé
-    </div>
-    """, unsafe_allow_html=True)
+st.markdown(FOOTER_HTML, unsafe_allow_html=True)